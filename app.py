@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, request
 from services.soil import SoilService
 from services.health import HealthService
 
@@ -13,4 +13,12 @@ def root():
 
 @app.route("/health")
 def health():
-    return health_service.get_health()
\ No newline at end of file
+    return health_service.get_health()
+
+@app.after_request
+def add_cache_control(response):
+    # Readings only change every couple of seconds, let clients and proxies reuse them.
+    # Errors must never be cached and shared
+    if response.status_code == 200 and request.endpoint in ('root', 'health'):
+        response.headers['Cache-Control'] = 'public, max-age=2'
+    return response
\ No newline at end of file
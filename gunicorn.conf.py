@@ -0,0 +1,9 @@
+# Picked up automatically by `gunicorn app:app` from the project directory
+
+# A single worker, as each worker would open its own I2C bus and sampler thread
+workers = 1
+
+# gevent patches blocking calls such as time.sleep, so one slow request
+# yields to the others instead of holding the worker
+worker_class = 'gevent'
+worker_connections = 100
@@ -1,18 +1,42 @@
-from abc import ABC, abstractmethod
+import importlib.util
 import os
-import random
+import struct
 import sys
-
-try:
-    import time
-    import board
-    from adafruit_seesaw.seesaw import Seesaw
-    print('Loaded adafruit components')
-except NotImplementedError:
-    # Will not run on anything other than a raspberry pi
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Protocol, Tuple, Type
+
+import numpy as np
+
+# Only attempt the import when the packages are installed, avoiding
+# the board package's platform detection on development machines
+if importlib.util.find_spec('board') and importlib.util.find_spec('adafruit_seesaw'):
+    try:
+        import board
+        import busio
+        from adafruit_seesaw.seesaw import Seesaw
+        print('Loaded adafruit components')
+    except NotImplementedError:
+        # Will not run on anything other than a raspberry pi
+        print('Unable to load adafruit components')
+else:
     print('Unable to load adafruit components')
 
-class SoilMonitorInterface(ABC):
+_HW_AVAILABLE = 'board' in sys.modules and 'adafruit_seesaw.seesaw' in sys.modules
+
+# Seesaw register addresses (base, function) for the capacitive touch
+# channel and the internal temperature sensor
+_SEESAW_MOISTURE_REGISTER = bytes([0x0F, 0x10])
+_SEESAW_TEMP_REGISTER = bytes([0x00, 0x04])
+_SEESAW_READ_DELAY = 0.005
+# Degrees per unit of the 16.16 fixed point temperature, as used by Seesaw.get_temp()
+_SEESAW_TEMP_SCALE = 0.00001525878
+
+def _to_tenths(degrees: float) -> int:
+    # Every temperature path goes through here so they round identically
+    return round(degrees * 10)
+
+class SoilMonitorInterface(Protocol):
     """
     Interface for defining interactions with soil monitor
     implementations
@@ -23,12 +47,15 @@ class SoilMonitorInterface(ABC):
     get_soil_saturation() -> int
         Returns the soil saturation as a percentage
     get_air_temp()
-        Returns the air temperature in degrees celcius
+        Returns the air temperature in tenths of a degree celcius
     get_name()
         Returns a human readable name for the implementation
+    read_all() -> tuple
+        Returns the soil saturation and air temperature together
     """
 
-    @abstractmethod
+    __slots__ = ()
+
     def get_soil_saturation(self) -> int:
         """ 
         Return the soil saturation from 0 to 100 as percentage
@@ -38,21 +65,19 @@ class SoilMonitorInterface(ABC):
         int
             The soil saturation as a percentage
         """
-        pass
+        ...
 
-    @abstractmethod
     def get_air_temp(self) -> int:
         """ 
-        Return the air temperature in celcius
+        Return the air temperature in tenths of a degree celcius
         
         Returns
         -------
         int
-            The air temperature in degrees celcius
+            The air temperature in tenths of a degree celcius
         """
-        pass
+        ...
 
-    @abstractmethod
     def get_name(self) -> str:
         """ 
         Return the name of the soil monitor
@@ -62,7 +87,18 @@ class SoilMonitorInterface(ABC):
         str
             The humand readable name for the soil monitor implementation
         """
-        pass
+        ...
+
+    def read_all(self) -> Tuple[int, int]:
+        """ 
+        Return the soil saturation and air temperature in a single read
+        
+        Returns
+        -------
+        tuple
+            The soil saturation as a percentage and the air temperature in tenths of a degree celcius
+        """
+        ...
 
 class SoilMonitorFactory():
     """
@@ -75,13 +111,15 @@ class SoilMonitorFactory():
     register_soil_monitor(key: str, soil_monitor: SoilMonitorInterface)
         Register a soil monitor implementation with a key
     get_soil_monitor(key: str)
-        Returns a given soil monitor implementation for the given registered key
+        Returns a given soil monitor implementation for the given registered key,
+        creating it on first request and reusing it afterwards
     """
 
-    def __init__(self):
-        self._soil_monitors = {}
+    def __init__(self) -> None:
+        self._soil_monitors: Dict[str, Type[SoilMonitorInterface]] = {}
+        self._instances: Dict[str, SoilMonitorInterface] = {}
 
-    def register_soil_monitor(self, key: str, soil_monitor: SoilMonitorInterface):
+    def register_soil_monitor(self, key: str, soil_monitor: Type[SoilMonitorInterface]) -> None:
         """
         Register a soil monitor implementation with a key
 
@@ -89,7 +127,7 @@ class SoilMonitorFactory():
         ----------
         key : str
             The key to register the implementation with
-        soil_monitor : SoilMonitorInterface
+        soil_monitor : Type[SoilMonitorInterface]
             The soil monitor implementation
         """
         self._soil_monitors[key] = soil_monitor
@@ -108,10 +146,60 @@ class SoilMonitorFactory():
         SoilMonitorInterface
             The implementation of a soil monitor for the given key
         """
-        soil_monitor = self._soil_monitors[key]
-        if not soil_monitor:
-            raise ValueError(key)
-        return soil_monitor()
+        instance = self._instances.get(key)
+        if instance is None:
+            soil_monitor = self._soil_monitors.get(key)
+            if soil_monitor is None:
+                raise ValueError(key)
+            instance = soil_monitor()
+            self._instances[key] = instance
+        return instance
+
+class _SamplerThread(threading.Thread):
+    """
+    Daemon thread that periodically takes a sample so readings
+    are never taken on the request path
+
+    ...
+    Methods
+    -------
+    run()
+        Calls the sample function every interval seconds until stopped
+    stop()
+        Stops sampling and waits for the thread to finish
+    """
+
+    def __init__(self, sample: Callable[[], None], interval: float) -> None:
+        super().__init__(name='soil-sampler', daemon=True)
+        self._sample = sample
+        self._interval = interval
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            try:
+                self._sample()
+            except Exception as e:
+                # Never let the sampler die, or readings would silently freeze
+                print(f'Soil monitor sampler error: {e!r}')
+
+    def stop(self) -> None:
+        """
+        Stops sampling and waits for the thread to finish
+        """
+        self._stopped.set()
+        self.join()
+
+def _sample_interval() -> float:
+    sample_hz = os.getenv('soil_sample_hz', '1')
+    try:
+        hz = float(sample_hz)
+    except ValueError:
+        hz = 0.0
+    if not hz > 0:
+        print(f'Invalid soil_sample_hz {sample_hz!r}, sampling at 1 Hz')
+        hz = 1.0
+    return 1 / hz
 
 class SoilMonitor(SoilMonitorInterface):
     """
@@ -119,7 +207,9 @@ class SoilMonitor(SoilMonitorInterface):
     delegates to the appropriate hardware implementation.
 
     Hardware implementation is determined using an environment 
-    variable `soil_monitor`
+    variable `soil_monitor`. Readings are sampled in the background
+    at `soil_sample_hz` (default 1) and served from the latest snapshot.
+    The most recent samples are also kept in a ring buffer for averaging
 
     ...
     Methods
@@ -127,16 +217,61 @@ class SoilMonitor(SoilMonitorInterface):
     get_soil_saturation() -> int
         Returns the soil saturation as a percentage
     get_air_temp() -> int
-        Returns the air temperature in degrees celcius
+        Returns the air temperature in tenths of a degree celcius
     get_name() -> str
         Returns a human readable name for the implementation
+    read_all() -> tuple
+        Returns the soil saturation and air temperature together
+    get_average_soil_saturation() -> Optional[float]
+        Returns the mean soil saturation over the buffered samples
+    get_average_air_temp() -> Optional[float]
+        Returns the mean air temperature over the buffered samples
+    get_sample_age() -> Optional[float]
+        Returns the seconds since the last successful sample
+    stop()
+        Stops the background sampler
     """
 
-    def __init__(self):
-        self._soil_monitor_name = os.getenv('soil_monitor')
-        if not self._soil_monitor_name:
-            self._soil_monitor_name = 'mocked'
-        self._soil_monitor = _soil_monitor_factory.get_soil_monitor(self._soil_monitor_name)
+    __slots__ = ('_soil_monitor_name', '_soil_monitor', '_name', '_snapshot', '_sampler',
+                 '_buf_sat', '_buf_temp', '_buf_ts', '_head')
+
+    _BUFFER_SIZE = 512
+
+    def __init__(self, factory: Optional[SoilMonitorFactory] = None) -> None:
+        if factory is None:
+            factory = _soil_monitor_factory
+        self._soil_monitor_name: str = os.getenv('soil_monitor') or 'mocked'
+        self._soil_monitor = factory.get_soil_monitor(self._soil_monitor_name)
+        self._name = self._soil_monitor.get_name()
+        self._buf_sat = np.empty(self._BUFFER_SIZE, dtype=np.int16)
+        self._buf_temp = np.empty(self._BUFFER_SIZE, dtype=np.int16)
+        self._buf_ts = np.empty(self._BUFFER_SIZE, dtype=np.int64)
+        self._head: int = 0
+        # Placeholder readings until the first successful sample
+        self._snapshot: Tuple[int, int, Optional[int]] = (-1, -10, None)
+        self._sample()
+        self._sampler = _SamplerThread(self._sample, _sample_interval())
+        self._sampler.start()
+
+    def _sample(self) -> None:
+        try:
+            saturation, temp = self._soil_monitor.read_all()
+        except Exception as e:
+            # Keep the last good snapshot, its age shows up in the health check
+            print(f'Unable to sample soil monitor: {e!r}')
+            return
+        sampled_at = time.monotonic_ns()
+        # A single attribute assignment, so readers always see a consistent snapshot
+        self._snapshot = (saturation, temp, sampled_at)
+        i = self._head % self._BUFFER_SIZE
+        self._buf_sat[i] = saturation
+        self._buf_temp[i] = temp
+        self._buf_ts[i] = sampled_at
+        # Only advance once the slot is written so readers never see a partial sample
+        self._head += 1
+
+    def _buffered(self) -> int:
+        return min(self._head, self._BUFFER_SIZE)
     
     def get_soil_saturation(self) -> int:
         """ 
@@ -147,18 +282,18 @@ class SoilMonitor(SoilMonitorInterface):
         int
             The soil saturation as a percentage
         """
-        return self._soil_monitor.get_soil_saturation()
+        return self._snapshot[0]
 
     def get_air_temp(self) -> int:
         """ 
-        Return the air temperature in celcius
+        Return the air temperature in tenths of a degree celcius
         
         Returns
         -------
         int
-            The air temperature in degrees celcius
+            The air temperature in tenths of a degree celcius
         """
-        return self._soil_monitor.get_air_temp()
+        return self._snapshot[1]
 
     def get_name(self) -> str:
         """ 
@@ -169,41 +304,99 @@ class SoilMonitor(SoilMonitorInterface):
         str
             The humand readable name for the soil monitor implementation
         """
-        return self._soil_monitor.get_name()
+        return self._name
+
+    def read_all(self) -> Tuple[int, int]:
+        """ 
+        Return the soil saturation and air temperature in a single read
+        
+        Returns
+        -------
+        tuple
+            The soil saturation as a percentage and the air temperature in tenths of a degree celcius
+        """
+        saturation, temp, _ = self._snapshot
+        return saturation, temp
+
+    def get_average_soil_saturation(self) -> Optional[float]:
+        """ 
+        Return the mean soil saturation over the buffered samples
+        
+        Returns
+        -------
+        Optional[float]
+            The average soil saturation as a percentage, or None if no sample has succeeded
+        """
+        samples = self._buffered()
+        if samples == 0:
+            return None
+        return float(self._buf_sat[:samples].mean())
+
+    def get_average_air_temp(self) -> Optional[float]:
+        """ 
+        Return the mean air temperature over the buffered samples
+        
+        Returns
+        -------
+        Optional[float]
+            The average air temperature in tenths of a degree celcius, or None if no sample has succeeded
+        """
+        samples = self._buffered()
+        if samples == 0:
+            return None
+        return float(self._buf_temp[:samples].mean())
+
+    def get_sample_age(self) -> Optional[float]:
+        """ 
+        Return how long ago the current readings were sampled
+        
+        Returns
+        -------
+        Optional[float]
+            The age of the latest successful sample in seconds, or None if no sample has succeeded
+        """
+        sampled_at = self._snapshot[2]
+        if sampled_at is None:
+            return None
+        return (time.monotonic_ns() - sampled_at) / 1_000_000_000
+
+    def stop(self) -> None:
+        """ 
+        Stop the background sampler, the latest readings stay available
+        """
+        self._sampler.stop()
 
 class _AdafruitStemmaSoilMonitor(SoilMonitorInterface):
     """ 
     Hardware implementation for the Adafruit Stemma I2C Soil Monitor
 
-    ...
-
-    Attributes
-    ----------
-    loaded : bool
-        Flag used to determine if everything has been set up correctly and the monitor is ready to use
+    Single readings are cached for `soil_cache_ttl` seconds (default 2.0)
+    so repeated calls do not each trigger an I2C transaction. read_all()
+    always reads the device, it is what the background sampler uses, and
+    refreshes the cache. The bus runs at `soil_i2c_hz` (default 400000, fast-mode)
 
+    ...
     Methods
     -------
     get_soil_saturation() -> int
         Returns the soil saturation as a percentage
     get_air_temp() -> int
-        Returns the air temperature in degrees celcius
+        Returns the air temperature in tenths of a degree celcius
     get_name() -> str
         Returns a human readable name for the implementation
+    read_all() -> tuple
+        Returns the soil saturation and air temperature together
     """
-    
-    def __init__(self):
-        self.loaded = True
-        if 'board' not in sys.modules:
-            print('board was not loaded')
-            self.loaded = False
-        if 'adafruit_seesaw.seesaw' not in sys.modules:
-            print('adafruit_seesaw.seesaw was not loaded')
-            self.loaded = False
-
-        if self.loaded:
-                i2c_bus = board.I2C()
-                self.ss = Seesaw(i2c_bus, addr=0x36)
+
+    __slots__ = ('ss', '_cache', '_ttl')
+
+    def __init__(self, ss: Optional[Any] = None) -> None:
+        if ss is None:
+            i2c_bus = busio.I2C(board.SCL, board.SDA, frequency=int(os.getenv('soil_i2c_hz', '400000')))
+            ss = Seesaw(i2c_bus, addr=0x36)
+        self.ss = ss
+        self._cache: Dict[str, Tuple[int, float]] = {'sat': (0, -1e9), 'temp': (0, -1e9)}
+        self._ttl = float(os.getenv('soil_cache_ttl', '2.0'))
 
     def get_soil_saturation(self) -> int:
         """ 
@@ -214,24 +407,30 @@ class _AdafruitStemmaSoilMonitor(SoilMonitorInterface):
         int
             The soil saturation as a percentage
         """
-        if self.loaded:
-            return self.ss.moisture_read()
-        print('Adafruit stemma device not set up, returning -1 for soil saturation')
-        return -1
+        now = time.monotonic()
+        saturation, read_at = self._cache['sat']
+        if now - read_at < self._ttl:
+            return saturation
+        saturation = self.ss.moisture_read()
+        self._cache['sat'] = (saturation, now)
+        return saturation
 
     def get_air_temp(self) -> int:
         """ 
-        Return the air temperature in celcius
+        Return the air temperature in tenths of a degree celcius
         
         Returns
         -------
         int
-            The air temperature in degrees celcius
+            The air temperature in tenths of a degree celcius
         """
-        if self.loaded:
-            return round(self.ss.get_temp(),1)
-        print('Adafruit stemma device not set up, returning -1 for soil saturation')
-        return -1 
+        now = time.monotonic()
+        temp, read_at = self._cache['temp']
+        if now - read_at < self._ttl:
+            return temp
+        temp = _to_tenths(self.ss.get_temp())
+        self._cache['temp'] = (temp, now)
+        return temp
 
     def get_name(self) -> str:
         """ 
@@ -244,21 +443,142 @@ class _AdafruitStemmaSoilMonitor(SoilMonitorInterface):
         """
         return 'Adafruit Stemma'
 
+    def read_all(self) -> Tuple[int, int]:
+        """ 
+        Return the soil saturation and air temperature, reading both
+        Seesaw registers under a single acquisition of the I2C bus.
+        Always reads the device, bypassing the cache
+        
+        Returns
+        -------
+        tuple
+            The soil saturation as a percentage and the air temperature in tenths of a degree celcius
+        """
+        # Seesaw.read() takes and releases the bus lock per register, so the
+        # register protocol is replayed here while holding the lock once
+        moisture_buf = bytearray(2)
+        temp_buf = bytearray(4)
+        with self.ss.i2c_device as i2c:
+            i2c.write(_SEESAW_MOISTURE_REGISTER)
+            time.sleep(_SEESAW_READ_DELAY)
+            i2c.readinto(moisture_buf)
+            i2c.write(_SEESAW_TEMP_REGISTER)
+            time.sleep(_SEESAW_READ_DELAY)
+            i2c.readinto(temp_buf)
+
+        saturation = struct.unpack('>H', moisture_buf)[0]
+        if saturation > 4095:
+            # Bad reading, let the driver retry
+            saturation = self.ss.moisture_read()
+        temp_buf[0] &= 0x3F
+        # Decode exactly as Seesaw.get_temp() does so this matches get_air_temp
+        temp = _to_tenths(_SEESAW_TEMP_SCALE * struct.unpack('>I', temp_buf)[0])
+
+        now = time.monotonic()
+        self._cache['sat'] = (saturation, now)
+        self._cache['temp'] = (temp, now)
+        return saturation, temp
+
+class _UnavailableSoilMonitor(SoilMonitorInterface):
+    """
+    Stands in for the Adafruit Stemma soil monitor when the adafruit
+    components could not be loaded, returning -1 for every reading
+
+    ...
+    Methods
+    -------
+    get_soil_saturation() -> int
+        Returns -1 as the soil saturation
+    get_air_temp() -> int
+        Returns -10 (-1 degree) as the air temperature
+    get_name() -> str
+        Returns a human readable name for the implementation
+    read_all() -> tuple
+        Returns the soil saturation and air temperature together
+    """
+
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        print('Adafruit stemma device not set up, returning -1 for all readings')
+
+    def get_soil_saturation(self) -> int:
+        """ 
+        Return -1 as the device is not set up
+        
+        Returns
+        -------
+        int
+            Always -1
+        """
+        return -1
+
+    def get_air_temp(self) -> int:
+        """ 
+        Return -10 tenths of a degree as the device is not set up
+        
+        Returns
+        -------
+        int
+            Always -10
+        """
+        return -10
+
+    def get_name(self) -> str:
+        """ 
+        Return the name of the soil monitor
+        
+        Returns
+        -------
+        str
+            The humand readable name for the soil monitor implementation
+        """
+        return 'Adafruit Stemma (unavailable)'
+
+    def read_all(self) -> Tuple[int, int]:
+        """ 
+        Return -1 for the soil saturation and -10 for the air temperature
+        
+        Returns
+        -------
+        tuple
+            The placeholder soil saturation and air temperature
+        """
+        return -1, -10
+
 class _MockedSoilMonitor(SoilMonitorInterface):
     """
     Mocked soil monitor for testing and local running
 
+    Random readings come from an inline 64 bit xorshift generator
+
     ...
     Methods
     -------
     get_soil_saturation() -> int
         Returns the soil saturation as a percentage
     get_air_temp() -> int
-        Returns the air temperature in degrees celcius
+        Returns the air temperature in tenths of a degree celcius
     get_name() -> str
         Returns a human readable name for the implementation
+    read_all() -> tuple
+        Returns the soil saturation and air temperature together
     """
 
+    __slots__ = ('_s',)
+
+    def __init__(self) -> None:
+        # xorshift state must never be zero
+        self._s = int.from_bytes(os.urandom(8), 'little') or 0x9E3779B97F4A7C15
+
+    def _next(self) -> int:
+        s = self._s
+        s ^= (s << 13) & 0xFFFFFFFFFFFFFFFF
+        s ^= s >> 7
+        s ^= (s << 17) & 0xFFFFFFFFFFFFFFFF
+        self._s = s
+        return s
+
     def get_soil_saturation(self) -> int:
         """ 
         Return a random soil saturation from 0 to 100 as percentage
@@ -268,18 +588,18 @@ class _MockedSoilMonitor(SoilMonitorInterface):
         int
             The soil saturation as a percentage
         """
-        return random.randint(0, 101)
+        return self._next() % 101
 
     def get_air_temp(self) -> int:
         """ 
-        Return a random air temperature in celcius
+        Return a random air temperature in tenths of a degree celcius
         
         Returns
         -------
         int
-            The air temperature in degrees celcius
+            The air temperature in tenths of a degree celcius
         """
-        return random.uniform(0, 50)
+        return self._next() % 501
 
     def get_name(self) -> str:
         """ 
@@ -292,6 +612,37 @@ class _MockedSoilMonitor(SoilMonitorInterface):
         """
         return 'Mocked Soil Monitor'
 
+    def read_all(self) -> Tuple[int, int]:
+        """ 
+        Return a random soil saturation and air temperature
+        
+        Returns
+        -------
+        tuple
+            The soil saturation as a percentage and the air temperature in tenths of a degree celcius
+        """
+        return self.get_soil_saturation(), self.get_air_temp()
+
 _soil_monitor_factory = SoilMonitorFactory()
-_soil_monitor_factory.register_soil_monitor('adafruitstemma', _AdafruitStemmaSoilMonitor)
-_soil_monitor_factory.register_soil_monitor('mocked', _MockedSoilMonitor)
\ No newline at end of file
+if _HW_AVAILABLE:
+    _soil_monitor_factory.register_soil_monitor('adafruitstemma', _AdafruitStemmaSoilMonitor)
+else:
+    _soil_monitor_factory.register_soil_monitor('adafruitstemma', _UnavailableSoilMonitor)
+_soil_monitor_factory.register_soil_monitor('mocked', _MockedSoilMonitor)
+
+_shared_monitor: Optional[SoilMonitor] = None
+
+def get_shared_monitor() -> SoilMonitor:
+    """
+    Returns the process wide soil monitor, creating it on first use
+    so the hardware is only set up once
+
+    Returns
+    -------
+    SoilMonitor
+        The shared soil monitor instance
+    """
+    global _shared_monitor
+    if _shared_monitor is None:
+        _shared_monitor = SoilMonitor()
+    return _shared_monitor
\ No newline at end of file
@@ -1,7 +1,10 @@
 import time  
 import os
 
-from .soil import SoilMonitor
+import orjson
+from flask import Response
+
+from hardware.soil_monitor import get_shared_monitor
 
 class HealthService:
     """
@@ -11,31 +14,33 @@ class HealthService:
     ...
     Methods
     -------
-    get_health() -> dict
-        Returns a dictionary with the `saturation` and `temp` keys
+    get_health() -> Response
+        Returns a JSON response with the `uptime`, `soilMonitor` and `sampleAge` keys
     """
 
-    def __init__(self):
-        self._start_time = time.time()
-        self._soil_monitor = SoilMonitor()
+    __slots__ = ('_start_ns', '_soil_monitor', '_name')
 
-    def _get_total_app_uptime_seconds(self):
-        return int(time.time() - self._start_time)
+    def __init__(self) -> None:
+        self._start_ns = time.monotonic_ns()
+        self._soil_monitor = get_shared_monitor()
+        self._name = self._soil_monitor.get_name()
 
-    def _get_current_soil_monitor(self):
-        return self._soil_monitor.get_name()
+    def _get_total_app_uptime_seconds(self) -> int:
+        return (time.monotonic_ns() - self._start_ns) // 1_000_000_000
 
-    def get_health(self) -> dict:
+    def get_health(self) -> Response:
         """
-        Returns a dict object that returns the `uptime` and
-        `soil_monitor` implementation
+        Returns a JSON response with the `uptime`, the
+        `soil_monitor` implementation and the age of its latest sample
 
         Returns
         -------
-        health : dict
-            Returns a dict with the uptime and current soil monitor implementation
+        health : Response
+            Returns a JSON response with the uptime, current soil monitor implementation
+            and the seconds since it last sampled successfully (null if it never has)
         """
-        return {
+        return Response(orjson.dumps({
             'uptime': self._get_total_app_uptime_seconds(),
-            'soilMonitor': self._get_current_soil_monitor()
-        }
\ No newline at end of file
+            'soilMonitor': self._name,
+            'sampleAge': self._soil_monitor.get_sample_age()
+        }), mimetype='application/json')
\ No newline at end of file
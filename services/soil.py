@@ -1,6 +1,9 @@
-from hardware.soil_monitor import SoilMonitor
+from typing import Optional
 
-soil_monitor = SoilMonitor()
+import orjson
+from flask import Response
+
+from hardware.soil_monitor import SoilMonitorInterface, get_shared_monitor
 
 class SoilService():
     """
@@ -10,24 +13,30 @@ class SoilService():
     ...
     Methods
     -------
-    get_soil_status() -> dict
-        Returns a dictionary with the `saturation` and `temp` keys
+    get_soil_status() -> Response
+        Returns a JSON response with the `saturation` and `temp` keys
     """
 
-    def get_soil_status(self):
+    __slots__ = ('_soil_monitor',)
+
+    def __init__(self, soil_monitor: Optional[SoilMonitorInterface] = None) -> None:
+        if soil_monitor is None:
+            soil_monitor = get_shared_monitor()
+        self._soil_monitor = soil_monitor
+
+    def get_soil_status(self) -> Response:
         """
-        Returns a dictionary with the `saturation` and `temp` keys
+        Returns a JSON response with the `saturation` and `temp` keys
 
         Returns
         -------
-        soil_status : dict
+        soil_status : Response
             Returns the saturation as a percentage and the temp in degrees celcius
         """
 
-        saturation = soil_monitor.get_soil_saturation()
-        temp = soil_monitor.get_air_temp()
+        saturation, temp = self._soil_monitor.read_all()
 
-        return {
+        return Response(orjson.dumps({
             'saturation': saturation,
-            'temp': temp
-        }
\ No newline at end of file
+            'temp': temp / 10
+        }), mimetype='application/json')
\ No newline at end of file
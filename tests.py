@@ -1,8 +1,92 @@
+import importlib.util
+import os
+import struct
+import subprocess
+import sys
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
 import app
 
-from hardware.soil_monitor import _MockedSoilMonitor
+from hardware.soil_monitor import _AdafruitStemmaSoilMonitor, _MockedSoilMonitor, _SamplerThread, _UnavailableSoilMonitor, SoilMonitor, SoilMonitorFactory, get_shared_monitor
 from services.health import HealthService
+from services.soil import SoilService
+
+class _FakeI2CDevice:
+    """Records register writes and answers reads from queued frames"""
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.writes = []
+        self.acquisitions = 0
+
+    def __enter__(self):
+        self.acquisitions += 1
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, buf):
+        self.writes.append(bytes(buf))
+
+    def readinto(self, buf):
+        buf[:] = self.frames.pop(0)
+
+class _FakeSeesaw:
+
+    def __init__(self, frames=(), moisture=500, temp=25.5):
+        self.i2c_device = _FakeI2CDevice(frames)
+        self.moisture = moisture
+        self.temp = temp
+        self.moisture_reads = 0
+        self.temp_reads = 0
+
+    def moisture_read(self):
+        self.moisture_reads += 1
+        return self.moisture
+
+    def get_temp(self):
+        self.temp_reads += 1
+        return self.temp
+
+class _FixedSoilMonitor:
+
+    def __init__(self, saturation, temp):
+        self.reading = (saturation, temp)
+
+    def get_name(self):
+        return 'Fixed'
+
+    def read_all(self):
+        return self.reading
+
+class _FailingSoilMonitor:
+
+    def get_name(self):
+        return 'Failing'
+
+    def read_all(self):
+        raise OSError('no device')
+
+def _monitor_with(soil_monitor, sample_hz='1'):
+    """Returns a SoilMonitor whose factory hands out the given implementation"""
+    class _Given:
+        def __new__(cls):
+            return soil_monitor
+    factory = SoilMonitorFactory()
+    factory.register_soil_monitor('mocked', _Given)
+    with mock.patch.dict(os.environ, {'soil_monitor': 'mocked', 'soil_sample_hz': sample_hz}):
+        return SoilMonitor(factory)
+
+def _adafruit_monitor(ss, ttl=2.0):
+    with mock.patch.dict(os.environ, {'soil_cache_ttl': str(ttl)}):
+        return _AdafruitStemmaSoilMonitor(ss)
+
+def _temp_frame(degrees):
+    return struct.pack('>I', int(degrees * 65536))
 
 class TestHealth(unittest.TestCase):
 
@@ -14,6 +98,41 @@ class TestHealth(unittest.TestCase):
         result = self.app.get('/')
         assert b'saturation' in result.data
         assert b'temp' in result.data
+        assert result.headers['Cache-Control'] == 'public, max-age=2'
+
+    def test_concurrent_requests_threaded(self):
+        def get(i):
+            return app.app.test_client().get('/' if i % 2 else '/health').status_code
+        with ThreadPoolExecutor(20) as executor:
+            statuses = list(executor.map(get, range(200)))
+        assert statuses == [200] * 200
+
+    @unittest.skipUnless(importlib.util.find_spec('gevent'), 'gevent is not installed')
+    def test_concurrent_requests_gevent(self):
+        # Mirrors the gunicorn gevent worker, monkey patching needs a fresh interpreter
+        script = (
+            'from gevent import monkey; monkey.patch_all()\n'
+            'import gevent.pool, app\n'
+            'def get(i):\n'
+            '    return app.app.test_client().get("/" if i % 2 else "/health").status_code\n'
+            'print(sorted(set(gevent.pool.Pool(20).map(get, range(200)))))\n'
+        )
+        result = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, timeout=60)
+        assert result.stdout.splitlines()[-1:] == ['[200]'], result.stderr
+
+    def test_errors_not_cached(self):
+        result = self.app.get('/missing')
+        assert result.status_code == 404
+        assert 'Cache-Control' not in result.headers
+
+    def test_home_reports_degrees(self):
+        result_json = SoilService(_FixedSoilMonitor(42, 237)).get_soil_status().get_json()
+        assert result_json == {'saturation': 42, 'temp': 23.7}
+
+    def test_home_unavailable_monitor(self):
+        result_json = SoilService(_UnavailableSoilMonitor()).get_soil_status().get_json()
+        assert result_json == {'saturation': -1, 'temp': -1.0}
 
     def test_health(self):
         result = self.app.get('/health')
@@ -21,6 +140,141 @@ class TestHealth(unittest.TestCase):
         assert b'uptime' in result.data
         result_json  = result.get_json()
         assert result_json['uptime'] >= 0
+        assert 0 <= result_json['sampleAge'] < 5
+        assert result.headers['Cache-Control'] == 'public, max-age=2'
+
+class TestSoilMonitor(unittest.TestCase):
+
+    def test_shared_monitor(self):
+        assert get_shared_monitor() is get_shared_monitor()
+        assert HealthService()._soil_monitor is get_shared_monitor()
+
+    def test_mocked_readings_in_range(self):
+        monitor = _MockedSoilMonitor()
+        for _ in range(1000):
+            saturation, temp = monitor.read_all()
+            assert 0 <= saturation <= 100
+            assert 0 <= temp <= 500
+
+    def test_average_readings(self):
+        monitor = get_shared_monitor()
+        assert 0 <= monitor.get_average_soil_saturation() <= 100
+        assert 0 <= monitor.get_average_air_temp() <= 500
+
+    def test_sampler_survives_errors(self):
+        calls = []
+        def sample():
+            calls.append(1)
+            if len(calls) == 1:
+                raise ValueError('bad reading')
+        sampler = _SamplerThread(sample, 0.01)
+        sampler.start()
+        time.sleep(0.1)
+        assert sampler.is_alive()
+        sampler.stop()
+        assert not sampler.is_alive()
+        assert len(calls) > 1
+
+    def test_failed_first_sample(self):
+        monitor = _monitor_with(_FailingSoilMonitor())
+        monitor.stop()
+        assert monitor.read_all() == (-1, -10)
+        assert monitor.get_sample_age() is None
+        assert monitor.get_average_soil_saturation() is None
+        assert monitor.get_average_air_temp() is None
+
+    def test_sampler_reads_device_every_interval(self):
+        frames = []
+        for i in range(40):
+            frames += [struct.pack('>H', 500 + i), _temp_frame(20.0)]
+        ss = _FakeSeesaw(frames)
+        monitor = _monitor_with(_adafruit_monitor(ss), sample_hz='20')
+        time.sleep(0.5)
+        monitor.stop()
+        samples = monitor._buffered()
+        assert samples >= 5
+        assert ss.i2c_device.acquisitions == samples
+        assert len(set(monitor._buf_sat[:samples])) == samples
+        assert len(set(monitor._buf_ts[:samples])) == samples
+        assert monitor.get_sample_age() < 0.2
+        assert monitor.get_average_soil_saturation() == sum(range(500, 500 + samples)) / samples
+        assert monitor.get_average_air_temp() == 200
+
+    def test_invalid_sample_hz(self):
+        for sample_hz in ('0', '-2', 'fast'):
+            monitor = _monitor_with(_FixedSoilMonitor(42, 237), sample_hz=sample_hz)
+            monitor.stop()
+            assert monitor.read_all() == (42, 237)
+
+    def test_unavailable_monitor_named(self):
+        monitor = _monitor_with(_UnavailableSoilMonitor())
+        monitor.stop()
+        assert monitor.get_name() == 'Adafruit Stemma (unavailable)'
+
+    def test_factory_reuses_instances(self):
+        factory = SoilMonitorFactory()
+        factory.register_soil_monitor('mocked', _MockedSoilMonitor)
+        assert factory.get_soil_monitor('mocked') is factory.get_soil_monitor('mocked')
+        with self.assertRaises(ValueError):
+            factory.get_soil_monitor('unknown')
+
+class TestAdafruitStemmaSoilMonitor(unittest.TestCase):
+
+    def test_read_all_single_acquisition(self):
+        ss = _FakeSeesaw([struct.pack('>H', 812), _temp_frame(25.5)])
+        assert _adafruit_monitor(ss).read_all() == (812, 255)
+        assert ss.i2c_device.acquisitions == 1
+        assert ss.i2c_device.writes == [bytes([0x0F, 0x10]), bytes([0x00, 0x04])]
+        assert ss.moisture_reads == 0
+
+    def test_read_all_bad_moisture_falls_back(self):
+        ss = _FakeSeesaw([b'\xff\xff', _temp_frame(21.0)], moisture=640)
+        assert _adafruit_monitor(ss).read_all() == (640, 210)
+        assert ss.moisture_reads == 1
+
+    def test_temp_paths_agree(self):
+        degrees = [0.0, 0.25, 0.75, 18.04, 21.05, 23.96, 25.5, 31.14999, 49.99]
+        # Every exact x.25 / x.75 tie between 0 and 50 degrees
+        degrees += [whole + fraction for whole in range(50) for fraction in (0.25, 0.75)]
+        for value in degrees:
+            raw = int(value * 65536)
+            # Same conversion the driver's get_temp uses
+            ss = _FakeSeesaw([struct.pack('>H', 500), struct.pack('>I', raw)], temp=0.00001525878 * raw)
+            burst_temp = _adafruit_monitor(ss).read_all()[1]
+            single_temp = _adafruit_monitor(ss).get_air_temp()
+            assert burst_temp == single_temp, value
+            assert abs(burst_temp - raw / 6553.6) <= 0.5, value
+
+    def test_read_all_bypasses_cache(self):
+        ss = _FakeSeesaw([struct.pack('>H', 812), _temp_frame(25.5),
+                          struct.pack('>H', 900), _temp_frame(26.0)])
+        monitor = _adafruit_monitor(ss)
+        assert monitor.read_all() == (812, 255)
+        assert monitor.read_all() == (900, 260)
+        assert ss.i2c_device.acquisitions == 2
+
+    def test_cached_within_ttl(self):
+        ss = _FakeSeesaw([struct.pack('>H', 812), _temp_frame(25.5)])
+        monitor = _adafruit_monitor(ss)
+        monitor.read_all()
+        assert monitor.get_soil_saturation() == 812
+        assert monitor.get_air_temp() == 255
+        assert ss.i2c_device.acquisitions == 1
+        assert ss.moisture_reads == 0
+        assert ss.temp_reads == 0
+
+    def test_reads_again_after_ttl(self):
+        ss = _FakeSeesaw(moisture=700, temp=26.0)
+        monitor = _adafruit_monitor(ss, ttl=0.05)
+        assert monitor.get_soil_saturation() == 700
+        assert monitor.get_air_temp() == 260
+        assert monitor.get_soil_saturation() == 700
+        assert ss.moisture_reads == 1
+        time.sleep(0.06)
+        assert monitor.get_soil_saturation() == 700
+        assert monitor.get_air_temp() == 260
+        assert ss.moisture_reads == 2
+        assert ss.temp_reads == 2
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file